@@ -0,0 +1,42 @@
+"""
+# Suggested repo path: fractal_amadeus/_checks.py
+
+Runtime type and contract checking for the Fractal Amadeus system.
+
+The typeguard and icontract decorators introspect arguments and evaluate predicates on
+every call, which costs far more than the work most of our functions do. They are only
+applied when FRACTAL_AMADEUS_CONTRACTS=1; otherwise the decorators exported here leave
+their targets unchanged.
+
+Usage:
+    from fractal_amadeus._checks import icontract, typechecked
+"""
+
+from __future__ import annotations
+import os
+from types import SimpleNamespace
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+CONTRACTS_ENABLED: bool = os.environ.get("FRACTAL_AMADEUS_CONTRACTS") == "1"
+
+if CONTRACTS_ENABLED:
+    import icontract
+    from typeguard import typechecked
+else:
+    def typechecked(target: T) -> T:
+        """Return the function or class unchanged, as type checking is disabled."""
+        return target
+
+    def _unchecked_contract(*args: Any, **kwargs: Any) -> Callable[[T], T]:
+        """Accept any contract arguments and return a decorator that changes nothing."""
+        return typechecked
+
+    icontract = SimpleNamespace(
+        require=_unchecked_contract,
+        ensure=_unchecked_contract,
+        invariant=_unchecked_contract,
+    )
+
+__all__ = ["CONTRACTS_ENABLED", "icontract", "typechecked"]
@@ -5,9 +5,11 @@ Core functionality for the Fractal Amadeus system.
 """
 
 from __future__ import annotations
-import icontract
-from typeguard import typechecked
-from typing import Callable
+import functools
+from fractal_amadeus._checks import icontract, typechecked
+from typing import Callable, Final
+
+_OKABE_ALIAS: Final[str] = "Hououin Kyouma"
 
 
 @icontract.require(lambda: True, "Always valid")  # Basic contract to demonstrate structure
@@ -15,11 +17,14 @@ from typing import Callable
                  "Preprompt length must be between 10 and 100,000 characters")
 @icontract.ensure(lambda result: "Kurisu" in result,
                  "Preprompt must contain Kurisu character information")
+@functools.lru_cache(maxsize=1)
 @typechecked
 def load_preprompt() -> str:
     """
     Load the latest preprompt file for Amadeus Kurisu.
 
+    The file is only read once; later calls return the cached contents.
+
     Returns:
         The contents of the preprompt file as a string
 
@@ -48,4 +53,4 @@ def get_other_name_for_okabe() -> str:
     Ensures:
         The result is exactly "Hououin Kyouma"
     """
-    return "Hououin Kyouma"
+    return _OKABE_ALIAS
@@ -0,0 +1,84 @@
+"""
+# Suggested repo path: fractal_amadeus/core/claude_config.py
+
+Shared configuration for talking to the Claude API.
+
+The API key is read from the environment (or a .env file) on first use rather than at
+import time, and only once however many modules need it.
+"""
+
+from __future__ import annotations
+import functools
+import os
+from typing import Final, Optional
+import httpx
+from fractal_amadeus._checks import icontract, typechecked
+
+API_URL: Final[str] = "https://api.anthropic.com/v1/messages"
+BATCHES_API_URL: Final[str] = "https://api.anthropic.com/v1/messages/batches"
+REQUEST_TIMEOUT: Final[httpx.Timeout] = httpx.Timeout(60.0, connect=3.05)
+CONNECTION_LIMITS: Final[httpx.Limits] = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+
+@functools.cache
+@typechecked
+def get_api_key() -> Optional[str]:
+    """
+    Get the Claude API key, loading the .env file on the first call.
+
+    Variables already set in the environment take precedence over the .env file.
+
+    Returns:
+        The value of CLAUDE_API_KEY, or None if it isn't set
+    """
+    from dotenv import load_dotenv  # deferred, so that importing this module does no I/O
+
+    load_dotenv(override=False)
+    return os.getenv("CLAUDE_API_KEY")
+
+
+@functools.cache
+@icontract.ensure(lambda result: result["x-api-key"], "Headers must include the API key")
+@typechecked
+def get_headers() -> httpx.Headers:
+    """
+    Get the HTTP headers for Claude API requests.
+
+    The headers are built once, as an httpx.Headers, so httpx can copy them into each
+    request without normalizing and encoding a plain dict every time.
+
+    Returns:
+        The request headers, including the API key
+
+    Raises:
+        RuntimeError: If CLAUDE_API_KEY isn't set
+    """
+    api_key: Optional[str] = get_api_key()
+    if not api_key:
+        raise RuntimeError("CLAUDE_API_KEY not found in environment variables. Please set it in .env file.")
+
+    return httpx.Headers({
+        "Content-Type": "application/json",
+        "anthropic-version": "2023-06-01",
+        "anthropic-beta": "prompt-caching-2024-07-31",
+        "x-api-key": api_key
+    })
+
+
+@typechecked
+def make_client() -> httpx.AsyncClient:
+    """
+    Create an HTTP client for the Claude API.
+
+    The client sends the API headers with every request. It keeps HTTP/2 connections
+    alive between requests, and lets concurrent requests share them. Failed requests
+    are left to the caller to retry.
+
+    Returns:
+        A new httpx.AsyncClient, to be closed by the caller
+
+    Raises:
+        RuntimeError: If CLAUDE_API_KEY isn't set
+    """
+    transport: httpx.AsyncHTTPTransport = httpx.AsyncHTTPTransport(http2=True, limits=CONNECTION_LIMITS)
+    return httpx.AsyncClient(transport=transport, headers=get_headers(), timeout=REQUEST_TIMEOUT)
@@ -13,7 +13,8 @@ else
     echo "Repomix not found, skipping..."
 fi
 git status
-poetry run pytest --cov=fractal_amadeus --exitfirst --failed-first tests/
+# Type and contract checks are off by default for speed; always run them here
+FRACTAL_AMADEUS_CONTRACTS=1 poetry run pytest --cov=fractal_amadeus --exitfirst --failed-first tests/
 
 echo
 echo "All tests succeeded successfully!"
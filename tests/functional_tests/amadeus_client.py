@@ -0,0 +1,650 @@
+"""
+# Suggested repo path: tests/functional_tests/amadeus_client.py
+
+Amadeus client used by the functional tests to talk to the Claude API as Amadeus Kurisu.
+
+Amadeus responses are logged at DEBUG level; run pytest with --log-cli-level=DEBUG to see them.
+"""
+
+from __future__ import annotations
+
+import os
+import logging
+import asyncio
+import contextlib
+import functools
+import hashlib
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Protocol, Set, Tuple, TypedDict, cast
+import diskcache
+import httpx
+import ijson
+import orjson
+from tenacity import (
+    RetryCallState, retry, retry_if_exception_type, retry_if_result, stop_after_attempt, wait_exponential_jitter
+)
+from icecream import ic
+from fractal_amadeus._checks import icontract, typechecked
+from fractal_amadeus.core import load_preprompt
+from fractal_amadeus.core.claude_config import API_URL, BATCHES_API_URL
+
+# Fix the import path: amadedeus_client -> amadeus_client
+from fractal_amadeus.core.amadeus_client import AsyncAmadeusProtocol
+from tests.helpers import find_missing_elements
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Claude API configuration
+MODEL: str = "claude-3-haiku-20240307"
+BATCH_POLL_INITIAL_DELAY: float = 1.0  # seconds
+BATCH_POLL_MAX_DELAY: float = 60.0     # seconds
+BATCH_TIMEOUT: float = 30 * 60.0       # seconds; batches can otherwise stay in progress for up to 24 hours
+RESPONSE_CACHE_DIR: str = os.path.expanduser("~/.cache/fractal_amadeus")
+TEXT_PLACEHOLDER: str = "<<AMADEUS_TEXT>>"
+RETRYABLE_STATUS_CODES: Set[int] = {429, 502, 503, 504, 529}  # 529: Claude API overloaded
+MAX_REQUEST_ATTEMPTS: int = 5
+MAX_RETRY_WAIT: float = 30.0           # seconds
+
+# Type definitions for API response
+class MessageContent(TypedDict):
+    type: str
+    text: str
+
+class ClaudeAPIResponse(TypedDict):
+    id: str
+    type: str
+    role: str
+    content: List[MessageContent]
+    model: str
+    stop_reason: str
+    stop_sequence: Optional[str]
+    usage: Dict[str, int]
+
+
+@typechecked
+def build_message_params(text: str) -> Dict[str, Any]:
+    """
+    Build the Claude Messages API parameters for sending text to Amadeus Kurisu.
+
+    The preprompt is sent as its own content block, marked for prompt caching, so that
+    requests after the first reuse the server-side cache instead of reprocessing it.
+
+    Args:
+        text: The text to send to the Claude API, after the Kurisu preprompt.
+
+    Returns:
+        Dict[str, Any]: The request parameters, shared by single and batch requests.
+    """
+    preprompt: str = load_preprompt()
+
+    return {
+        "model": MODEL,
+        "temperature": 0,             # Full determinism – always choose the most likely token
+        "top_p": 0.9,                 # Sample only from the top 90% probability mass (slightly trims edge cases)
+        "stop_sequences": ["User:"],  # Stops at a logical boundary – useful if you later auto-parse response blocks
+        "max_tokens": 1000,           # Reasonable ceiling to ensure long enough replies but avoid overrun
+
+    "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": preprompt, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": text}
+                ]
+            }
+        ]
+    }
+
+
+@functools.lru_cache(maxsize=2)
+@typechecked
+def message_body_template(stream: bool) -> Tuple[bytes, bytes]:
+    """
+    Pre-encode the JSON request body for the Claude Messages API, around the text to send.
+
+    Everything but the text (the model settings and the large preprompt) is the same for
+    every request, so it is only serialized once.
+
+    Args:
+        stream: Whether the body requests a streamed response.
+
+    Returns:
+        Tuple[bytes, bytes]: The encoded body before and after the JSON-encoded text.
+
+    Raises:
+        ValueError: If another string in the body is equal to the placeholder for the text.
+    """
+    params: Dict[str, Any] = build_message_params(TEXT_PLACEHOLDER)
+    if stream:
+        params["stream"] = True
+
+    body: bytes = orjson.dumps(params)
+    parts: List[bytes] = body.split(orjson.dumps(TEXT_PLACEHOLDER))
+    if len(parts) != 2:
+        raise ValueError(f"The text placeholder {TEXT_PLACEHOLDER!r} must be the only JSON string with its value "
+                         f"in the request body, found {len(parts) - 1}")
+    return parts[0], parts[1]
+
+
+@typechecked
+def encode_message_body(text: str, stream: bool = False) -> bytes:
+    """
+    Encode the JSON request body for sending text to Amadeus Kurisu.
+
+    Args:
+        text: The text to send to the Claude API, after the Kurisu preprompt.
+        stream: Whether to request a streamed response.
+
+    Returns:
+        bytes: The request body, equivalent to build_message_params(text) as JSON.
+    """
+    prefix, suffix = message_body_template(stream)
+    return prefix + orjson.dumps(text) + suffix
+
+
+@typechecked
+async def read_message_text(response: httpx.Response) -> str:
+    """
+    Read the text of the first content block from a streamed Messages API response.
+
+    The body is parsed incrementally as it arrives, and only the text is kept, rather
+    than decoding the whole response (usage metrics, stop reason, ...) into a dict.
+    Once the text has been found, the rest of the body is read without parsing it, so
+    that the connection can go back to the pool.
+
+    Args:
+        response: A streamed, successful Messages API response.
+
+    Returns:
+        str: The text of the first content block.
+
+    Raises:
+        ValueError: If the response contains no text content.
+    """
+    texts: List[str] = ijson.sendable_list()
+    parser = ijson.items_coro(texts, "content.item.text")
+    async for chunk in response.aiter_bytes():
+        if not texts:  # no need to parse the rest of the body
+            parser.send(chunk)
+
+    if not texts:
+        parser.close()
+        raise ValueError("Claude API response has no text content")
+    return texts[0]
+
+
+@typechecked
+def is_retryable_response(response: httpx.Response) -> bool:
+    """
+    Check whether a Claude API response is a transient failure worth retrying.
+
+    Args:
+        response: The API response.
+
+    Returns:
+        bool: True for rate-limited and temporarily unavailable responses.
+    """
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+_backoff = wait_exponential_jitter(initial=1, max=MAX_RETRY_WAIT)
+
+
+@typechecked
+def wait_before_retry(retry_state: RetryCallState) -> float:
+    """
+    Decide how long to wait before retrying a Claude API request.
+
+    Honours the Retry-After header of rate-limited responses, up to MAX_RETRY_WAIT, and
+    otherwise backs off exponentially, with jitter.
+
+    Args:
+        retry_state: The state of the request being retried.
+
+    Returns:
+        float: The number of seconds to wait.
+    """
+    outcome = retry_state.outcome
+    if outcome is not None and not outcome.failed:
+        retry_after: Optional[str] = outcome.result().headers.get("retry-after")
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_WAIT)
+    return _backoff(retry_state)
+
+
+@retry(
+    wait=wait_before_retry,
+    stop=stop_after_attempt(MAX_REQUEST_ATTEMPTS),
+    retry=retry_if_exception_type(httpx.TransportError) | retry_if_result(is_retryable_response),
+    retry_error_callback=lambda retry_state: retry_state.outcome.result(),  # the last response, or its error
+)
+@typechecked
+async def send_with_retries(http_session: httpx.AsyncClient, request: httpx.Request,
+                            stream: bool = False) -> httpx.Response:
+    """
+    Send a Claude API request, retrying transient failures.
+
+    Connection errors, timeouts and retryable responses are retried with backoff. Once
+    the attempts run out, the last response is returned (or its error raised), so that
+    raise_for_status() reports it.
+
+    Args:
+        http_session: The client to send the request with.
+        request: The request to send; its body must be bytes, so it can be sent again.
+        stream: Whether to return without reading the response body.
+
+    Returns:
+        httpx.Response: The response to the last attempt.
+    """
+    response: httpx.Response = await http_session.send(request, stream=stream)
+    if stream and is_retryable_response(response):
+        await response.aread()  # release the connection before retrying
+    return response
+
+
+@retry(
+    wait=wait_before_retry,
+    stop=stop_after_attempt(MAX_REQUEST_ATTEMPTS),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout)) | retry_if_result(is_retryable_response),
+    retry_error_callback=lambda retry_state: retry_state.outcome.result(),  # the last response, or its error
+)
+@typechecked
+async def send_once_with_retries(http_session: httpx.AsyncClient, request: httpx.Request) -> httpx.Response:
+    """
+    Send a Claude API request that must not be repeated once the server has received it.
+
+    Like send_with_retries(), but of the transport errors only failures to connect are
+    retried. After a read timeout, the server may already have acted on the request, and
+    sending it again would, for example, create (and bill) a second Message Batch.
+
+    Args:
+        http_session: The client to send the request with.
+        request: The request to send; its body must be bytes, so it can be sent again.
+
+    Returns:
+        httpx.Response: The response to the last attempt.
+    """
+    return await http_session.send(request)
+
+
+@contextlib.asynccontextmanager
+async def stream_with_retries(http_session: httpx.AsyncClient, method: str, url: str,
+                              content: bytes) -> AsyncIterator[httpx.Response]:
+    """
+    Stream a Claude API response, retrying transient failures like send_with_retries().
+
+    Args:
+        http_session: The client to send the request with.
+        method: The HTTP method.
+        url: The URL to send the request to.
+        content: The request body.
+
+    Yields:
+        httpx.Response: The streamed response, closed when the block exits.
+    """
+    request: httpx.Request = http_session.build_request(method, url, content=content)
+    response: httpx.Response = await send_with_retries(http_session, request, stream=True)
+    try:
+        yield response
+    finally:
+        await response.aclose()
+
+
+@typechecked
+def response_cache_key(text: str, expected_elements: Optional[List[str]] = None) -> str:
+    """
+    Build the response cache key for sending text to Amadeus Kurisu.
+
+    Requests are sent with temperature 0, so the same model, preprompt and text always
+    produce the same response.
+
+    Args:
+        text: The text to send to the Claude API, after the Kurisu preprompt.
+        expected_elements: For a response that test_until() cut off once these elements
+            were seen, which is not the full response.
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request.
+    """
+    key: str = f"{MODEL}|{load_preprompt()}|{text}"
+    if expected_elements is not None:
+        key += f"|{orjson.dumps(expected_elements).decode()}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@contextlib.contextmanager
+def open_response_cache(directory: str = RESPONSE_CACHE_DIR) -> Iterator[Optional[diskcache.Cache]]:
+    """
+    Open the on-disk cache of Claude API responses, shared across test runs.
+
+    Only enabled when FRACTAL_AMADEUS_CACHE=1, so that CI runs still exercise the real API.
+
+    Args:
+        directory: The directory holding the cache.
+
+    Yields:
+        Optional[diskcache.Cache]: The response cache, or None when caching is disabled.
+    """
+    if os.getenv("FRACTAL_AMADEUS_CACHE") != "1":
+        yield None
+        return
+
+    with diskcache.Cache(directory) as cache:
+        yield cache
+
+
+class Amadeus(AsyncAmadeusProtocol):
+    """
+    Amadeus client implementation for testing the Claude API with the Kurisu persona.
+    """
+
+    @icontract.require(lambda http_session: http_session is not None, "HTTP session cannot be None")
+    @typechecked
+    def __init__(self, http_session: httpx.AsyncClient,
+                 prefetched_responses: Optional[Dict[str, str]] = None,
+                 response_cache: Optional[diskcache.Cache] = None) -> None:
+        """
+        Initialize the Amadeus client with an HTTP session.
+
+        The session is owned by the caller and shared with other clients, so Amadeus
+        never closes it.
+
+        Args:
+            http_session: An httpx.AsyncClient for the Claude API, sending the API headers.
+            prefetched_responses: Responses already fetched by test_batch(), keyed by input text.
+            response_cache: An on-disk cache of API response contents, keyed by response_cache_key().
+        """
+        # Things related to the quest:
+        self.latest_request_api_url: Optional[str] = None
+        self.latest_request_headers: Optional[httpx.Headers] = None
+        self.latest_request_body: Optional[bytes] = None
+
+        # Things related to the response
+        self.latest_message_content: Optional[str] = None
+        self.latest_response: Optional[httpx.Response] = None
+
+        # HTTP session
+        self.http_session: httpx.AsyncClient = http_session
+
+        # Responses fetched ahead of time, in a single batch
+        self.prefetched_responses: Dict[str, str] = prefetched_responses or {}
+
+        # Responses from earlier test runs
+        self.response_cache: Optional[diskcache.Cache] = response_cache
+
+    @icontract.require(lambda text: text, "Input text cannot be empty")
+    @icontract.ensure(lambda result: result, "Response cannot be empty")
+    @typechecked
+    async def test(self, text: str) -> str:
+        """
+        Run a basic smoke test to verify Claude API connectivity and character response.
+
+        If the response for text was prefetched with test_batch(), or is in the response
+        cache, it is returned without calling the API again.
+
+        Args:
+            text: The text to send to the Claude API.
+
+        Returns:
+            str: The response message content from the Claude API.
+
+        Raises:
+            httpx.HTTPError: If the API request fails.
+        """
+        known_response: Optional[str] = self._known_response(text)
+        if known_response is not None:
+            self.latest_message_content = known_response
+            return self.latest_message_content
+
+        logger.debug("🔬 Initiating Fractal Amadeus e2e smoke test sequence...")
+        logger.debug("🧪 Testing connection to Claude 3.5 Haiku API...")
+
+        # Prepare the API request
+        body: bytes = encode_message_body(text)
+
+        # Send the request to Claude API
+        self.latest_request_api_url = API_URL
+        self.latest_request_headers = self.http_session.headers
+        self.latest_request_body = body
+
+        async with stream_with_retries(self.http_session, "POST", API_URL, body) as response:
+            response.raise_for_status()
+            self.latest_response = response
+
+            # Parse the response
+            self.latest_message_content = await read_message_text(response)
+
+        if self.response_cache is not None:
+            self.response_cache[response_cache_key(text)] = self.latest_message_content
+
+        # Log the response
+        logger.debug("\n===== AMADEUS SYSTEM RESPONSE =====\n\n%s\n\n===================================\n",
+                     self.latest_message_content)
+
+        # Return it now:
+        return self.latest_message_content
+
+    @icontract.require(lambda text: text, "Input text cannot be empty")
+    @icontract.require(lambda expected_elements: len(expected_elements) > 0,
+                     "Expected elements list cannot be empty")
+    @icontract.ensure(lambda result: result, "Response cannot be empty")
+    @typechecked
+    async def test_until(self, text: str, expected_elements: List[str]) -> str:
+        """
+        Stream a response from the Claude API, stopping as soon as it contains all expected elements.
+
+        Tests that only check for a few elements don't have to wait for the rest of the
+        response to be generated. Prefetched and cached responses are used like in test().
+        A response that was cut off is only cached for the same expected elements.
+
+        Args:
+            text: The text to send to the Claude API.
+            expected_elements: Strings that the test expects in the response.
+
+        Returns:
+            str: The response message content, up to the point where all expected elements
+            were seen, or the whole response if some of them never appeared.
+
+        Raises:
+            httpx.HTTPError: If the API request fails.
+            RuntimeError: If the API reports an error while streaming.
+        """
+        known_response: Optional[str] = self._known_response(text, expected_elements)
+        if known_response is not None:
+            self.latest_message_content = known_response
+            return self.latest_message_content
+
+        logger.debug("🔬 Initiating Fractal Amadeus e2e smoke test sequence...")
+        logger.debug("🧪 Streaming from Claude 3.5 Haiku API...")
+
+        # Prepare the API request
+        body: bytes = encode_message_body(text, stream=True)
+
+        # Send the request to Claude API
+        self.latest_request_api_url = API_URL
+        self.latest_request_headers = self.http_session.headers
+        self.latest_request_body = body
+
+        buffer: bytearray = bytearray()
+        remaining: Dict[str, bytes] = {elem: elem.encode() for elem in expected_elements}
+        async with stream_with_retries(self.http_session, "POST", API_URL, body) as response:
+            response.raise_for_status()
+            self.latest_response = response
+
+            # Server-sent events; the text arrives in content_block_delta events
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event: Dict[str, Any] = orjson.loads(line[len("data:"):])
+                if event["type"] == "error":
+                    raise RuntimeError(f"Claude API error while streaming: {event['error']}")
+                if event["type"] != "content_block_delta" or event["delta"]["type"] != "text_delta":
+                    continue
+
+                # Only the new text, plus enough overlap for an element split across deltas, needs searching
+                start: int = len(buffer)
+                buffer += event["delta"]["text"].encode()
+                for elem, encoded in list(remaining.items()):
+                    if buffer.find(encoded, max(0, start - len(encoded) + 1)) >= 0:
+                        del remaining[elem]
+                if not remaining:
+                    break  # leaving the block closes the stream, cancelling the rest of the response
+
+        self.latest_message_content = buffer.decode()
+
+        if self.response_cache is not None:
+            # Once every element was seen the stream may have been cut off, so that isn't the full response
+            cache_key: str = response_cache_key(text, None if remaining else expected_elements)
+            self.response_cache[cache_key] = self.latest_message_content
+
+        # Log the response
+        logger.debug("\n===== AMADEUS SYSTEM RESPONSE =====\n\n%s\n\n===================================\n",
+                     self.latest_message_content)
+
+        return self.latest_message_content
+
+    @typechecked
+    def _known_response(self, text: str, expected_elements: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Look up a response for text that was prefetched or cached, without calling the API.
+
+        Args:
+            text: The text to send to the Claude API.
+            expected_elements: Also look for a response that test_until() cut off once these
+                elements were seen.
+
+        Returns:
+            Optional[str]: The known response message content, or None.
+        """
+        if text in self.prefetched_responses:
+            return self.prefetched_responses[text]
+
+        if self.response_cache is None:
+            return None
+
+        cached: Optional[str] = self.response_cache.get(response_cache_key(text))
+        if cached is None and expected_elements is not None:
+            cached = self.response_cache.get(response_cache_key(text, expected_elements))
+        return cached
+
+    @icontract.require(lambda texts: all(texts), "Input texts cannot be empty")
+    @icontract.ensure(lambda result, texts: len(result) == len(texts), "Expected one response per input text")
+    @typechecked
+    async def test_many(self, texts: List[str]) -> List[str]:
+        """
+        Send several texts to the Claude API concurrently.
+
+        The requests share the HTTP session's connections, so the total wall time is
+        roughly that of the slowest request. The latest_* attributes end up describing
+        whichever request finished last.
+
+        Args:
+            texts: The texts to send to the Claude API.
+
+        Returns:
+            List[str]: The response message contents, in the same order as texts.
+        """
+        return list(await asyncio.gather(*[self.test(text) for text in texts]))
+
+    @icontract.require(lambda texts: all(texts), "Input texts cannot be empty")
+    @icontract.ensure(lambda result, texts: len(result) == len(texts), "Expected one response per input text")
+    @typechecked
+    async def test_batch(self, texts: List[str]) -> List[str]:
+        """
+        Send several texts to the Claude API as a single Message Batch.
+
+        Polls the batch with exponential backoff until it has ended, then downloads the
+        results and remembers them in prefetched_responses, so that later test() calls
+        for the same texts don't call the API again. A batch still in progress after
+        BATCH_TIMEOUT seconds is cancelled.
+
+        Args:
+            texts: The texts to send to the Claude API.
+
+        Returns:
+            List[str]: The response message contents, in the same order as texts.
+
+        Raises:
+            httpx.HTTPError: If any of the API requests fail.
+            RuntimeError: If the batch did not succeed for one of the texts.
+            TimeoutError: If the batch did not end within BATCH_TIMEOUT seconds.
+        """
+        batch_requests: List[Dict[str, Any]] = [
+            {"custom_id": f"prompt-{index}", "params": build_message_params(text)}
+            for index, text in enumerate(texts)
+        ]
+        response: httpx.Response = await send_once_with_retries(self.http_session, self.http_session.build_request(
+            "POST", BATCHES_API_URL, content=orjson.dumps({"requests": batch_requests})
+        ))
+        response.raise_for_status()
+        batch: Dict[str, Any] = orjson.loads(response.content)
+
+        deadline: float = time.monotonic() + BATCH_TIMEOUT
+        delay: float = BATCH_POLL_INITIAL_DELAY
+        while batch["processing_status"] != "ended":
+            if time.monotonic() + delay > deadline:
+                await self._cancel_batch(batch["id"])
+                raise TimeoutError(f"Batch {batch['id']} did not end within {BATCH_TIMEOUT:.0f} seconds, cancelled it")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BATCH_POLL_MAX_DELAY)
+            response = await send_with_retries(
+                self.http_session, self.http_session.build_request("GET", f"{BATCHES_API_URL}/{batch['id']}")
+            )
+            response.raise_for_status()
+            batch = orjson.loads(response.content)
+
+        response = await send_with_retries(
+            self.http_session, self.http_session.build_request("GET", batch["results_url"])
+        )
+        response.raise_for_status()
+
+        # The results are JSONL, in no particular order
+        contents: Dict[str, str] = {}
+        for line in response.text.splitlines():
+            entry: Dict[str, Any] = orjson.loads(line)
+            if entry["result"]["type"] != "succeeded":
+                raise RuntimeError(f"Batch request {entry['custom_id']} {entry['result']['type']}: {entry['result']}")
+            message: ClaudeAPIResponse = cast(ClaudeAPIResponse, entry["result"]["message"])
+            contents[entry["custom_id"]] = message["content"][0]["text"]
+
+        responses: List[str] = [contents[f"prompt-{index}"] for index in range(len(texts))]
+        self.prefetched_responses.update(zip(texts, responses))
+        return responses
+
+    @typechecked
+    async def _cancel_batch(self, batch_id: str) -> None:
+        """
+        Ask the Claude API to cancel a Message Batch, so that it stops processing (and billing) requests.
+
+        A failure to cancel is only logged, since the caller is already giving up on the batch.
+
+        Args:
+            batch_id: The ID of the batch to cancel.
+        """
+        response: httpx.Response = await send_with_retries(
+            self.http_session, self.http_session.build_request("POST", f"{BATCHES_API_URL}/{batch_id}/cancel")
+        )
+        if response.is_error:
+            logger.warning("Failed to cancel batch %s: HTTP %d %s", batch_id, response.status_code, response.text)
+
+    @icontract.require(lambda self: self.latest_message_content is not None,
+                     "No message content available. Run test() first.")
+    @icontract.require(lambda expected_elements: len(expected_elements) > 0,
+                     "Expected elements list cannot be empty")
+    @typechecked
+    def raise_for_some_elements_not_returned(self, expected_elements: List[str]) -> None:
+        """
+        Check if the expected elements are present in the latest message content.
+
+        Args:
+            expected_elements: A list of strings that are expected to be in the latest message content.
+
+        Raises:
+            ValueError: If no message content is available.
+            AssertionError: If any expected elements are not found in the content.
+        """
+        if self.latest_message_content is None:
+            raise ValueError("No message content available. Run test() first.")
+
+        missing_elements: List[str] = find_missing_elements(self.latest_message_content, expected_elements)
+        assert missing_elements == [], f"Missing elements: {missing_elements}"
@@ -0,0 +1,106 @@
+"""
+# Suggested repo path: tests/functional_tests/conftest.py
+
+Pytest hooks and shared fixtures for the Fractal Amadeus functional tests.
+"""
+
+from __future__ import annotations
+import os
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+import diskcache
+import httpx
+import pytest
+import pytest_asyncio
+
+from fractal_amadeus.core.claude_config import get_api_key, make_client
+from tests.functional_tests.amadeus_client import Amadeus, open_response_cache
+
+AMADEUS_PROMPTS: pytest.StashKey[List[str]] = pytest.StashKey[List[str]]()
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Register the amadeus_prompt marker."""
+    config.addinivalue_line(
+        "markers",
+        "amadeus_prompt(text): the text the test sends to Amadeus, "
+        "prefetched in a single Message Batch when FRACTAL_AMADEUS_BATCH=1",
+    )
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config: pytest.Config, items: List[pytest.Item]) -> None:
+    """
+    Collect the prompts of every selected test that talks to Amadeus.
+
+    Runs last, so that tests deselected with -k or -m don't add their prompts to the batch.
+    """
+    prompts: List[str] = [
+        marker.args[0] for item in items for marker in item.iter_markers("amadeus_prompt")
+    ]
+    config.stash[AMADEUS_PROMPTS] = list(dict.fromkeys(prompts))  # unique, in collection order
+
+
+@pytest.fixture(scope="session")
+def amadeus_prompts(pytestconfig: pytest.Config) -> List[str]:
+    """
+    Fixture providing the prompts of the collected Amadeus tests.
+
+    Returns:
+        The unique prompts, in collection order
+    """
+    return pytestconfig.stash.get(AMADEUS_PROMPTS, [])
+
+
+@pytest_asyncio.fixture(scope="session")
+async def batch_responses(http_session: httpx.AsyncClient, amadeus_prompts: List[str]) -> Dict[str, str]:
+    """
+    Fetch the responses for every collected Amadeus prompt in one Message Batch.
+
+    Only enabled when FRACTAL_AMADEUS_BATCH=1, since batches can take minutes to process.
+
+    Args:
+        http_session: The HTTP session fixture.
+        amadeus_prompts: The prompts of the collected tests.
+
+    Returns:
+        Dict[str, str]: The responses keyed by prompt, or an empty dict when batching is disabled.
+    """
+    if os.getenv("FRACTAL_AMADEUS_BATCH") != "1" or not amadeus_prompts:
+        return {}
+
+    batch_client: Amadeus = Amadeus(http_session)
+    await batch_client.test_batch(amadeus_prompts)
+    return batch_client.prefetched_responses
+
+
+@pytest_asyncio.fixture(scope="session")
+async def http_session() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Fixture providing the one httpx.AsyncClient shared by every test in the session.
+
+    Creating a client per test would throw its connection pool away each time. The
+    client sends the Claude API headers by default. Tests that need it are skipped
+    when no API key is configured.
+
+    Yields:
+        A client for making Claude API requests
+    """
+    if not get_api_key():
+        pytest.skip("CLAUDE_API_KEY not found in environment variables. Please set it in .env file.")
+
+    async with make_client() as client:
+        yield client  # closed after all tests are done
+
+
+@pytest.fixture(scope="session")
+def response_cache() -> Iterator[Optional[diskcache.Cache]]:
+    """
+    Provide the on-disk cache of Claude API responses, shared across test runs.
+
+    Only enabled when FRACTAL_AMADEUS_CACHE=1, so that CI runs still exercise the real API.
+
+    Yields:
+        Optional[diskcache.Cache]: The response cache, or None when caching is disabled.
+    """
+    with open_response_cache() as cache:
+        yield cache
@@ -0,0 +1,524 @@
+"""
+# Suggested repo path: tests/functional_tests/test_amadeus_client.py
+
+Offline tests for the Amadeus client, against an httpx.MockTransport instead of the Claude API.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List
+import diskcache
+import httpx
+import orjson
+import pytest
+from tenacity import RetryCallState, wait_none
+from fractal_amadeus._checks import icontract, typechecked
+from fractal_amadeus.core import load_preprompt
+
+from fractal_amadeus.core.claude_config import BATCHES_API_URL
+from tests.functional_tests import amadeus_client
+from tests.functional_tests.amadeus_client import (
+    MAX_REQUEST_ATTEMPTS,
+    MAX_RETRY_WAIT,
+    MODEL,
+    TEXT_PLACEHOLDER,
+    Amadeus,
+    build_message_params,
+    encode_message_body,
+    message_body_template,
+    open_response_cache,
+    read_message_text,
+    response_cache_key,
+    send_once_with_retries,
+    send_with_retries,
+    stream_with_retries,
+    wait_before_retry,
+)
+
+RESULTS_URL: str = f"{BATCHES_API_URL}/batch-1/results"
+MESSAGES_URL: str = "https://example.com/v1/messages"
+
+
+@typechecked
+def make_message(text: str) -> Dict[str, Any]:
+    """
+    Build a complete Claude API message with a single text content block.
+
+    Args:
+        text: The text of the message.
+
+    Returns:
+        Dict[str, Any]: The message, as the API returns it.
+    """
+    return {
+        "id": "msg-1",
+        "type": "message",
+        "role": "assistant",
+        "model": MODEL,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 1, "output_tokens": 1},
+    }
+
+
+@typechecked
+def text_delta_events(deltas: List[str]) -> List[Dict[str, Any]]:
+    """
+    Build the server-sent events of a streamed message with the given text deltas.
+
+    Args:
+        deltas: The pieces of text, in the order they are streamed.
+
+    Returns:
+        List[Dict[str, Any]]: The events, as the API streams them.
+    """
+    return [
+        {"type": "message_start", "message": make_message("")},
+        {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+        *[{"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta}}
+          for delta in deltas],
+        {"type": "content_block_stop", "index": 0},
+        {"type": "message_stop"},
+    ]
+
+
+@typechecked
+def streaming_handler(events: List[Dict[str, Any]],
+                      sent: List[Dict[str, Any]]) -> Callable[[httpx.Request], httpx.Response]:
+    """
+    Build a MockTransport handler that streams events as server-sent events.
+
+    Args:
+        events: The events to stream.
+        sent: Collects every event as it is streamed, to check how much of the stream was read.
+
+    Returns:
+        Callable[[httpx.Request], httpx.Response]: The handler.
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert orjson.loads(request.content)["stream"] is True, "Request must ask for a streamed response"
+
+        async def body() -> AsyncIterator[bytes]:
+            for event in events:
+                sent.append(event)
+                yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body())
+
+    return handler
+
+
+@pytest.mark.parametrize("text", [
+    'Say "hi"', "C:\\path\\to\\file", "nul\x00byte", "Kurisu \u2014 \u7262\u6728 \U0001f9ea", "\n\t",
+])
+@pytest.mark.parametrize("stream", [False, True])
+@typechecked
+def test_encoded_message_body_matches_params(text: str, stream: bool) -> None:
+    """
+    Test that splicing the text into the pre-encoded body gives the same bytes as encoding the parameters.
+
+    Args:
+        text: The text to send, with characters that JSON must escape
+        stream: Whether the body requests a streamed response
+    """
+    params: Dict[str, Any] = build_message_params(text)
+    if stream:
+        params["stream"] = True
+    assert encode_message_body(text, stream=stream) == orjson.dumps(params), \
+        "Body must be the JSON encoding of the parameters"
+
+
+@icontract.require(lambda monkeypatch: monkeypatch is not None, "Monkeypatch must be provided")
+@typechecked
+def test_message_body_template_rejects_placeholder_in_preprompt(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that a preprompt equal to the text placeholder is reported, rather than failing to unpack.
+
+    Args:
+        monkeypatch: The monkeypatch fixture, for replacing the preprompt
+    """
+    monkeypatch.setattr(amadeus_client, "load_preprompt", lambda: TEXT_PLACEHOLDER)
+    message_body_template.cache_clear()
+    try:
+        with pytest.raises(ValueError, match="found 2"):
+            message_body_template(False)
+    finally:
+        message_body_template.cache_clear()
+
+
+@typechecked
+async def test_read_message_text_reads_whole_body() -> None:
+    """
+    Test that read_message_text() returns the first text, but still reads the body to the end.
+    """
+    chunks: List[bytes] = [b'{"content": [{"type": "text", "text": "Hello, Okabe."}]', b', "usage": {}', b"}"]
+    sent: List[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        async def body() -> AsyncIterator[bytes]:
+            for chunk in chunks:
+                sent.append(chunk)
+                yield chunk
+
+        return httpx.Response(200, content=body())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        async with client.stream("POST", MESSAGES_URL) as response:
+            assert await read_message_text(response) == "Hello, Okabe.", "Text must be read from the first block"
+            assert response.is_stream_consumed, "Body must be read to the end, so the connection can be reused"
+
+    assert sent == chunks, "Every chunk of the body must be read"
+
+
+@icontract.require(lambda tmp_path: tmp_path is not None, "Temporary directory must be provided")
+@typechecked
+async def test_response_cache_miss_stores_text(tmp_path: Path) -> None:
+    """
+    Test that a response that isn't cached is fetched from the API, and its text cached for the exact request.
+
+    Args:
+        tmp_path: A temporary directory for the response cache
+    """
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=make_message("Hello, Okabe."))
+
+    with diskcache.Cache(str(tmp_path)) as cache:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            content: str = await Amadeus(client, response_cache=cache).test("Hello")
+
+        key: str = hashlib.sha256(f"{MODEL}|{load_preprompt()}|Hello".encode()).hexdigest()
+        assert len(requests) == 1, "A cache miss must call the API"
+        assert content == "Hello, Okabe.", "Response must be the API's"
+        assert list(cache) == [key], "Response must be cached under the model, preprompt and text"
+        assert cache[key] == "Hello, Okabe.", "Only the message text must be cached"
+
+
+@icontract.require(lambda tmp_path: tmp_path is not None, "Temporary directory must be provided")
+@typechecked
+async def test_response_cache_hit_skips_api(tmp_path: Path) -> None:
+    """
+    Test that a cached response is returned without sending any request.
+
+    Args:
+        tmp_path: A temporary directory for the response cache
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError(f"Unexpected request to {request.url}")
+
+    with diskcache.Cache(str(tmp_path)) as cache:
+        cache[response_cache_key("Hello")] = "Cached hello."
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            amadeus: Amadeus = Amadeus(client, response_cache=cache)
+            assert await amadeus.test("Hello") == "Cached hello.", "Cached response must be returned"
+        assert amadeus.latest_request_body is None, "No request must be sent for a cached response"
+
+
+@icontract.require(lambda monkeypatch: monkeypatch is not None, "Monkeypatch must be provided")
+@typechecked
+def test_response_cache_is_opt_in(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """
+    Test that the response cache is only opened when FRACTAL_AMADEUS_CACHE=1.
+
+    Args:
+        monkeypatch: The monkeypatch fixture, for setting FRACTAL_AMADEUS_CACHE
+        tmp_path: A temporary directory for the response cache
+    """
+    monkeypatch.delenv("FRACTAL_AMADEUS_CACHE", raising=False)
+    with open_response_cache(str(tmp_path)) as cache:
+        assert cache is None, "Caching must be disabled by default"
+
+    monkeypatch.setenv("FRACTAL_AMADEUS_CACHE", "1")
+    with open_response_cache(str(tmp_path)) as cache:
+        assert isinstance(cache, diskcache.Cache), "Caching must be enabled with FRACTAL_AMADEUS_CACHE=1"
+
+
+@typechecked
+async def test_many_sends_texts_concurrently() -> None:
+    """
+    Test that test_many() has every request in flight at once, and returns the responses in input order.
+    """
+    texts: List[str] = ["first", "second", "third"]
+    all_in_flight: asyncio.Event = asyncio.Event()
+    in_flight: List[str] = []
+    finished: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        text: str = orjson.loads(request.content)["messages"][0]["content"][1]["text"]
+        in_flight.append(text)
+        if len(in_flight) == len(texts):
+            all_in_flight.set()
+        await asyncio.wait_for(all_in_flight.wait(), timeout=5)  # only returns if the requests overlap
+        await asyncio.sleep(0.01 * (len(texts) - texts.index(text)))  # finish in reverse order
+        finished.append(text)
+        return httpx.Response(200, json=make_message(f"Answer to {text}"))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        responses: List[str] = await Amadeus(client).test_many(texts)
+
+    assert finished == list(reversed(texts)), "Requests must run concurrently, finishing in any order"
+    assert responses == [f"Answer to {text}" for text in texts], "Responses must be in the same order as the texts"
+
+
+@typechecked
+async def test_until_finds_elements_split_across_deltas() -> None:
+    """
+    Test that test_until() finds expected elements even when the stream splits them across deltas.
+    """
+    sent: List[Dict[str, Any]] = []
+    deltas: List[str] = ["[Sys", "tem bo", "ot]\n", "Kur", "isu: Sys", "tem check", " complete."]
+    async with httpx.AsyncClient(transport=httpx.MockTransport(streaming_handler(text_delta_events(deltas), sent))) as client:
+        amadeus: Amadeus = Amadeus(client)
+        content: str = await amadeus.test_until("Hello", ["Kurisu:", "System boot", "System check"])
+
+    assert content == "".join(deltas[:-1]), "Content must be the streamed text, up to the last expected element"
+    amadeus.raise_for_some_elements_not_returned(["Kurisu:", "System boot", "System check"])
+
+
+@typechecked
+async def test_until_stops_reading_once_elements_are_found() -> None:
+    """
+    Test that test_until() stops reading the stream as soon as every expected element has been seen.
+    """
+    sent: List[Dict[str, Any]] = []
+    deltas: List[str] = ["[System ", "boot]\n", "Kuri", "su: Hello.", " Never", " read."]
+    async with httpx.AsyncClient(transport=httpx.MockTransport(streaming_handler(text_delta_events(deltas), sent))) as client:
+        amadeus: Amadeus = Amadeus(client)
+        content: str = await amadeus.test_until("Hello", ["Kurisu:", "System boot"])
+
+    assert content == "[System boot]\nKurisu: Hello.", "Content must end with the delta completing the elements"
+    assert "Never" not in {event.get("delta", {}).get("text") for event in sent}, \
+        "Stream must not be read past the delta completing the elements"
+
+
+@typechecked
+async def test_until_raises_on_error_event() -> None:
+    """
+    Test that test_until() raises when the API reports an error in the middle of the stream.
+    """
+    sent: List[Dict[str, Any]] = []
+    events: List[Dict[str, Any]] = text_delta_events(["[System "])[:3] + [
+        {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+    ]
+    async with httpx.AsyncClient(transport=httpx.MockTransport(streaming_handler(events, sent))) as client:
+        amadeus: Amadeus = Amadeus(client)
+        with pytest.raises(RuntimeError, match="overloaded_error"):
+            await amadeus.test_until("Hello", ["Kurisu:"])
+
+
+@icontract.require(lambda tmp_path: tmp_path is not None, "Temporary directory must be provided")
+@typechecked
+async def test_until_caches_cut_off_response_for_its_elements(tmp_path: Path) -> None:
+    """
+    Test that a second test_until() call with the same text and elements is served from the response cache.
+
+    Args:
+        tmp_path: A temporary directory for the response cache
+    """
+    sent: List[Dict[str, Any]] = []
+    events: List[Dict[str, Any]] = text_delta_events(["[System ", "boot]\n", "Kurisu: Hello.", " More."])
+    handler: Callable[[httpx.Request], httpx.Response] = streaming_handler(events, sent)
+    requests: List[httpx.Request] = []
+
+    def counting_handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return handler(request)
+
+    with diskcache.Cache(str(tmp_path)) as cache:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(counting_handler)) as client:
+            amadeus: Amadeus = Amadeus(client, response_cache=cache)
+            first: str = await amadeus.test_until("Hello", ["Kurisu:", "System boot"])
+            second: str = await amadeus.test_until("Hello", ["Kurisu:", "System boot"])
+
+        assert len(requests) == 1, "Second call must be served from the cache"
+        assert second == first == "[System boot]\nKurisu: Hello.", "Cached response must be the streamed one"
+        assert cache.get(response_cache_key("Hello")) is None, "A cut-off response must not pass for the full one"
+        assert cache.get(response_cache_key("Hello", ["Kurisu:", "System boot"])) == first, \
+            "Cut-off response must be cached for its expected elements"
+
+
+@icontract.require(lambda monkeypatch: monkeypatch is not None, "Monkeypatch must be provided")
+@typechecked
+async def test_batch_matches_results_to_texts(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that test_batch() creates and polls a batch, and matches the results to their texts.
+
+    The results are returned in reverse order, since the API doesn't promise any order.
+
+    Args:
+        monkeypatch: The monkeypatch fixture, for skipping the polling delay
+    """
+    monkeypatch.setattr(amadeus_client, "BATCH_POLL_INITIAL_DELAY", 0.0)
+    custom_ids: List[str] = []
+    polls: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            assert str(request.url) == BATCHES_API_URL, "Batch must be created at the batches endpoint"
+            custom_ids.extend(entry["custom_id"] for entry in orjson.loads(request.content)["requests"])
+            return httpx.Response(200, json={"id": "batch-1", "processing_status": "in_progress"})
+        if str(request.url) == f"{BATCHES_API_URL}/batch-1":
+            polls.append(request.method)
+            status: str = "ended" if len(polls) == 2 else "in_progress"
+            return httpx.Response(200, json={"id": "batch-1", "processing_status": status, "results_url": RESULTS_URL})
+        assert str(request.url) == RESULTS_URL, f"Unexpected request to {request.url}"
+        lines: List[bytes] = [
+            orjson.dumps({"custom_id": custom_id,
+                          "result": {"type": "succeeded", "message": make_message(f"Answer to {custom_id}")}})
+            for custom_id in reversed(custom_ids)
+        ]
+        return httpx.Response(200, content=b"\n".join(lines))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        amadeus: Amadeus = Amadeus(client)
+        responses: List[str] = await amadeus.test_batch(["first", "second", "third"])
+
+    assert polls == ["GET", "GET"], "Batch must be polled until it has ended"
+    assert responses == ["Answer to prompt-0", "Answer to prompt-1", "Answer to prompt-2"], \
+        "Responses must be in the same order as the texts"
+    assert amadeus.prefetched_responses == {
+        "first": "Answer to prompt-0",
+        "second": "Answer to prompt-1",
+        "third": "Answer to prompt-2",
+    }, "Every response must be prefetched under its own text"
+
+
+@icontract.require(lambda monkeypatch: monkeypatch is not None, "Monkeypatch must be provided")
+@typechecked
+async def test_batch_is_cancelled_when_it_takes_too_long(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Test that test_batch() gives up on a batch that stays in progress, and cancels it.
+
+    Args:
+        monkeypatch: The monkeypatch fixture, for shortening the batch timeout
+    """
+    monkeypatch.setattr(amadeus_client, "BATCH_POLL_INITIAL_DELAY", 0.0)
+    monkeypatch.setattr(amadeus_client, "BATCH_TIMEOUT", 0.0)
+    requests: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(f"{request.method} {request.url}")
+        return httpx.Response(200, json={"id": "batch-1", "processing_status": "in_progress"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        amadeus: Amadeus = Amadeus(client)
+        with pytest.raises(TimeoutError, match="batch-1"):
+            await amadeus.test_batch(["first"])
+
+    assert requests == [f"POST {BATCHES_API_URL}", f"POST {BATCHES_API_URL}/batch-1/cancel"], \
+        "Batch must be cancelled once it has taken too long"
+    assert amadeus.prefetched_responses == {}, "Nothing must be prefetched from a cancelled batch"
+
+
+@typechecked
+def test_retry_after_is_capped() -> None:
+    """
+    Test that a long Retry-After doesn't stall the tests for longer than the backoff would.
+    """
+    retry_state: RetryCallState = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})
+    retry_state.set_result(httpx.Response(429, headers={"Retry-After": "3600"}))
+    assert wait_before_retry(retry_state) == MAX_RETRY_WAIT, "Retry-After must be capped"
+
+    retry_state.set_result(httpx.Response(429, headers={"Retry-After": "2"}))
+    assert wait_before_retry(retry_state) == 2.0, "A short Retry-After must be honoured"
+
+
+@typechecked
+async def test_send_retries_rate_limited_request() -> None:
+    """
+    Test that a rate-limited request is sent again, and the successful response returned.
+    """
+    statuses: List[int] = [429, 200]
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(statuses[len(requests) - 1], headers={"Retry-After": "0"}, json={"ok": True})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response: httpx.Response = await send_with_retries(
+            client, client.build_request("POST", MESSAGES_URL, content=b'{"text": "Hello"}')
+        )
+
+    assert response.status_code == 200, "Successful response must be returned"
+    assert len(requests) == 2, "Request must be sent again after the 429"
+    assert requests[1].content == b'{"text": "Hello"}', "Retried request must carry the same body"
+
+
+@typechecked
+async def test_send_returns_last_response_when_attempts_run_out() -> None:
+    """
+    Test that once every attempt failed, the last response is returned for raise_for_status() to report.
+    """
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(529 if len(requests) == MAX_REQUEST_ATTEMPTS else 503, headers={"Retry-After": "0"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        response: httpx.Response = await send_with_retries(client, client.build_request("GET", MESSAGES_URL))
+
+    assert len(requests) == MAX_REQUEST_ATTEMPTS, "Request must be attempted MAX_REQUEST_ATTEMPTS times"
+    assert response.status_code == 529, "Last response must be returned"
+    with pytest.raises(httpx.HTTPStatusError):
+        response.raise_for_status()
+
+
+@typechecked
+async def test_stream_retries_overloaded_request() -> None:
+    """
+    Test that a streamed request is retried, after reading the body of the failed response.
+    """
+    statuses: List[int] = [529, 200]
+    sent: List[bytes] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status: int = statuses[len(sent) // 2]
+
+        async def body() -> AsyncIterator[bytes]:
+            for chunk in [f"{status} ".encode(), b"body"]:
+                sent.append(chunk)
+                yield chunk
+
+        return httpx.Response(status, headers={"Retry-After": "0"}, content=body())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        async with stream_with_retries(client, "POST", MESSAGES_URL, b"{}") as response:
+            assert sent == [b"529 ", b"body"], "Failed response must be read to the end before retrying"
+            assert response.status_code == 200, "Successful response must be yielded"
+            assert await response.aread() == b"200 body", "Successful response must still be readable"
+
+
+@typechecked
+async def test_send_once_only_retries_failed_connections() -> None:
+    """
+    Test that a request that mustn't be repeated is retried when it couldn't connect, but not after a read timeout.
+    """
+    errors: List[httpx.TransportError] = []
+    requests: List[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if errors:
+            raise errors.pop(0)
+        return httpx.Response(200, json={"id": "batch-1"})
+
+    send_once: Callable[..., Any] = send_once_with_retries.retry_with(wait=wait_none())  # no backoff
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        errors.append(httpx.ConnectError("Connection refused"))
+        response: httpx.Response = await send_once(client, client.build_request("POST", BATCHES_API_URL))
+        assert response.status_code == 200, "Request must be sent again when it couldn't connect"
+        assert len(requests) == 2, "Request must be retried once"
+
+        requests.clear()
+        errors.append(httpx.ReadTimeout("Timed out"))
+        with pytest.raises(httpx.ReadTimeout):
+            await send_once(client, client.build_request("POST", BATCHES_API_URL))
+        assert len(requests) == 1, "Request the server may have received must not be sent again"
+
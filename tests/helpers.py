@@ -0,0 +1,38 @@
+"""
+# Suggested repo path: tests/helpers.py
+
+Helpers shared by the unit and functional tests.
+"""
+
+from __future__ import annotations
+from typing import List, Set
+import ahocorasick
+from fractal_amadeus._checks import typechecked
+
+
+@typechecked
+def find_missing_elements(content: str, expected_elements: List[str]) -> List[str]:
+    """
+    Find the expected elements that don't occur in a message content.
+
+    Args:
+        content: The message content to search.
+        expected_elements: The strings expected in the content. The empty string is in any content.
+
+    Returns:
+        List[str]: The missing elements, in the order they were expected.
+    """
+    # Fast path: nothing to report when every element is present
+    if all(elem in content for elem in expected_elements):
+        return []
+
+    # Find the missing elements for the error message, in a single pass over the content
+    automaton: ahocorasick.Automaton = ahocorasick.Automaton()
+    for elem in expected_elements:
+        if elem:  # the empty string is in any content, but can't be added to the automaton
+            automaton.add_word(elem, elem)
+    automaton.make_automaton()
+
+    found_elements: Set[str] = {elem for _, elem in automaton.iter(content)}
+
+    return [elem for elem in expected_elements if elem and elem not in found_elements]
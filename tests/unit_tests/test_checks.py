@@ -0,0 +1,58 @@
+"""
+# Suggested repo path: tests/unit_tests/test_checks.py
+
+Unit tests for switching runtime type and contract checking on and off.
+"""
+
+from __future__ import annotations
+import importlib
+from typing import Iterator
+import pytest
+
+import fractal_amadeus._checks as checks
+
+
+@pytest.fixture
+def reload_checks(monkeypatch: pytest.MonkeyPatch) -> Iterator[pytest.MonkeyPatch]:
+    """
+    Fixture that reloads the checks module once the test is done with it.
+
+    Yields:
+        The monkeypatch fixture, for setting FRACTAL_AMADEUS_CONTRACTS before a reload
+    """
+    yield monkeypatch
+    monkeypatch.undo()
+    importlib.reload(checks)
+
+
+def test_checks_leave_functions_unchanged_by_default(reload_checks: pytest.MonkeyPatch) -> None:
+    """
+    Test that the decorators are no-ops unless contracts are enabled.
+    """
+    reload_checks.delenv("FRACTAL_AMADEUS_CONTRACTS", raising=False)
+    importlib.reload(checks)
+
+    def double(value: int) -> int:
+        return value * 2
+
+    assert not checks.CONTRACTS_ENABLED
+    assert checks.typechecked(double) is double, "typechecked must return the function unchanged"
+    assert checks.icontract.require(lambda value: value > 0)(double) is double, \
+        "Contracts must return the function unchanged"
+    assert double(-1) == -2, "Unchecked functions must accept arguments violating their contracts"
+
+
+def test_checks_enforce_contracts_when_enabled(reload_checks: pytest.MonkeyPatch) -> None:
+    """
+    Test that FRACTAL_AMADEUS_CONTRACTS=1 switches on the real icontract decorators.
+    """
+    reload_checks.setenv("FRACTAL_AMADEUS_CONTRACTS", "1")
+    importlib.reload(checks)
+
+    @checks.icontract.require(lambda value: value > 0, "Value must be positive")
+    def double(value: int) -> int:
+        return value * 2
+
+    assert checks.CONTRACTS_ENABLED
+    with pytest.raises(checks.icontract.ViolationError):
+        double(-1)
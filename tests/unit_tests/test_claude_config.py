@@ -0,0 +1,58 @@
+"""
+# Suggested repo path: tests/unit_tests/test_claude_config.py
+
+Unit tests for the shared Claude API configuration.
+"""
+
+from __future__ import annotations
+from typing import Iterator
+import pytest
+from fractal_amadeus._checks import icontract, typechecked
+
+from fractal_amadeus.core.claude_config import get_api_key, get_headers
+
+
+@pytest.fixture
+def fresh_config(monkeypatch: pytest.MonkeyPatch) -> Iterator[pytest.MonkeyPatch]:
+    """
+    Fixture that forgets the cached API configuration before and after the test.
+
+    Yields:
+        The monkeypatch fixture, for setting CLAUDE_API_KEY
+    """
+    monkeypatch.setattr("dotenv.load_dotenv", lambda override=False: False)
+    get_api_key.cache_clear()
+    get_headers.cache_clear()
+    yield monkeypatch
+    get_api_key.cache_clear()
+    get_headers.cache_clear()
+
+
+@icontract.require(lambda fresh_config: fresh_config is not None, "Monkeypatch must be provided")
+@typechecked
+def test_headers_include_api_key(fresh_config: pytest.MonkeyPatch) -> None:
+    """
+    Test that the request headers carry the API key from the environment.
+
+    Args:
+        fresh_config: The monkeypatch fixture, with the configuration cache cleared
+    """
+    fresh_config.setenv("CLAUDE_API_KEY", "test-key")
+    headers = get_headers()
+    assert headers["X-Api-Key"] == "test-key", "Headers must include the API key, under any capitalization"
+    assert get_headers() is headers, "Headers must only be built once"
+
+
+@icontract.require(lambda fresh_config: fresh_config is not None, "Monkeypatch must be provided")
+@typechecked
+def test_headers_require_api_key(fresh_config: pytest.MonkeyPatch) -> None:
+    """
+    Test that building the headers without an API key fails clearly.
+
+    Args:
+        fresh_config: The monkeypatch fixture, with the configuration cache cleared
+    """
+    fresh_config.delenv("CLAUDE_API_KEY", raising=False)
+    assert get_api_key() is None, "API key must be None when it isn't set"
+    with pytest.raises(RuntimeError):
+        get_headers()
@@ -6,11 +6,11 @@ Unit tests for the Okabe message flow in the Fractal Amadeus system.
 
 from __future__ import annotations
 import pytest
-from typeguard import typechecked
-import icontract
+from fractal_amadeus._checks import icontract, typechecked
 from typing import List, Optional, Protocol, Final, cast
 
 from fractal_amadeus.core import load_preprompt, get_other_name_for_okabe
+from tests.helpers import find_missing_elements
 
 
 class AmadeusProtocol(Protocol):
@@ -41,6 +41,20 @@ def test_can_load_preprompt() -> None:
     assert "Child prodigy neuroscientist" in content, "Preprompt must contain Kurisu's scientific background"
 
 
+@icontract.require(lambda: True, "Preprompt must be accessible")
+@typechecked
+def test_preprompt_is_only_read_once() -> None:
+    """
+    Test that repeated preprompt loads reuse the cached contents.
+
+    This test verifies that the second call is served from the cache
+    rather than re-reading the preprompt file.
+    """
+    first = load_preprompt()
+    second = load_preprompt()
+    assert second is first, "Repeated loads must return the cached preprompt"
+
+
 @icontract.require(lambda: True, "Function must be callable")
 @typechecked
 def test_okabe_calls_himself_Hououin_Kyouma() -> None:
@@ -98,7 +112,7 @@ class DummyAmadeus(AmadeusProtocol):
         Raises:
             AssertionError: If any elements are missing
         """
-        missing_elements: List[str] = [elem for elem in expected_elements if elem not in self.latest_message_content]
+        missing_elements: List[str] = find_missing_elements(self.latest_message_content, expected_elements)
         assert missing_elements == [], f"Missing elements: {missing_elements}"
 
 
@@ -177,3 +191,20 @@ def test_amadeus_fails_with_some_expected_values_not_present(amadeus: DummyAmade
     # This will fail because our dummy response doesn't contain these elements
     with pytest.raises(AssertionError):
         amadeus.raise_for_some_elements_not_returned(["Kurisu:", "System boot", "["])
+
+
+@icontract.require(lambda amadeus: amadeus is not None, "Amadeus instance must be provided")
+@typechecked
+def test_amadeus_treats_empty_expected_value_as_present(amadeus: DummyAmadeus) -> None:
+    """
+    Test that an empty expected element is always present, and isn't reported as missing.
+
+    Args:
+        amadeus: The DummyAmadeus instance to test
+    """
+    amadeus.test(
+        "The user, Okabe, opens the phone app and asks Amadeus Kurisu about healthy alternatives to cup noodles."
+    )
+    amadeus.raise_for_some_elements_not_returned(["", "Does this help"])
+    with pytest.raises(AssertionError, match=r"Missing elements: \['Doggoes'\]"):
+        amadeus.raise_for_some_elements_not_returned(["", "Doggoes"])